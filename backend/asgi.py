@@ -0,0 +1,10 @@
+"""
+ASGI entry point for production servers.
+
+The __main__ block in main.py starts the single-threaded development
+server; in production run multiple workers so concurrent reviews are
+served in parallel:
+
+    hypercorn --bind 0.0.0.0:5000 --workers 4 --keep-alive 600 asgi:app
+"""
+from main import app  # noqa: F401
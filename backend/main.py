@@ -1,25 +1,322 @@
+import ast
+import asyncio
+import functools
+import gzip
 import os
-from dotenv import load_dotenv, dotenv_values
+from concurrent.futures import ThreadPoolExecutor
+import re
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
 
-import requests
-from typing import Dict, Any
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+import httpx
+import numpy as np
+import orjson
+from prometheus_client import Histogram, generate_latest, CONTENT_TYPE_LATEST
+from sentence_transformers import SentenceTransformer
+from typing import Any, Dict, List, Optional, Tuple
+from quart import Quart, Response, request, jsonify
+from quart.json.provider import DefaultJSONProvider
+from quart_cors import cors
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
 
-# Load environment variables
+# Load environment variables into os.environ (dotenv_values only parsed
+# the file without applying it, leaving OLLAMA_API_BASE_URL unset)
 
-env_path = os.path.join(os.path.dirname(__file__), '../.env')
-env_config = dotenv_values(env_path)
+load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
 
-app = Flask(__name__)
-CORS(app, resources={r"/api/*": {"origins": "*", "methods": ["POST", "OPTIONS"]}})
+class ORJSONProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson, a C extension several times
+    faster than the stdlib json module on large review payloads"""
 
-OLLAMA_API_BASE_URL = os.getenv("OLLAMA_API_BASE_URL")
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+app = Quart(__name__)
+app.json = ORJSONProvider(app)
+app = cors(app, allow_origin="*", allow_methods=["POST", "OPTIONS"])
+
+# Bound worst-case LLM compute: requests above MAX_CONTENT_LENGTH are
+# refused outright, and code above MAX_CODE_CHARS is reviewed chunk by
+# chunk instead of blowing out the model's context window
+app.config['MAX_CONTENT_LENGTH'] = 512 * 1024
+MAX_CODE_CHARS = 32_000
+
+def resolve_ollama_url() -> str:
+    """
+    Resolve the Ollama generate endpoint once at import time.
+
+    Returns:
+        str: URL from OLLAMA_API_BASE_URL, or derived from OLLAMA_HOST
+            with the standard local default
+    """
+    url = os.getenv("OLLAMA_API_BASE_URL")
+    if url:
+        return url
+    host = os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434")
+    return host.rstrip('/') + '/api/generate'
+
+OLLAMA_API_BASE_URL = resolve_ollama_url()
+
+# How long Ollama keeps model weights loaded between requests; set to -1
+# for always-resident so no review pays the multi-second model reload
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+# Match the Ollama server's configured parallelism: dispatching more
+# concurrent generations than OLLAMA_NUM_PARALLEL only builds a queue on
+# the Ollama side that slows every in-flight request
+OLLAMA_NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+
+_ollama_semaphore: Optional[asyncio.Semaphore] = None
+
+# Shared async HTTP client so concurrent reviews reuse pooled keep-alive
+# connections instead of paying a handshake per request
+CLIENT: httpx.AsyncClient = None
+
+# Semantic cache: near-identical code (whitespace tweaks, renamed variables)
+# returns the prior review instead of re-running a multi-second LLM generation
+SIMILARITY_THRESHOLD = 0.87
+CACHE_MAX_ENTRIES = 1024
+EMBEDDING_DIM = 384
+
+# The in-memory matrix is stored int8 (4x less memory and bandwidth than
+# float32 for the similarity matmul); cosine similarity survives the
+# quantization because the embeddings are already unit-normalized
+EMBEDDING_SCALE = 1.0 / 127.0
+
+EMBEDDING_MODEL = SentenceTransformer('all-MiniLM-L6-v2')
+
+_cache_embeddings = np.empty((0, EMBEDDING_DIM), dtype=np.int8)
+_cache_responses: List[Dict[str, Any]] = []
+
+def quantize_embedding(embedding: np.ndarray) -> np.ndarray:
+    """
+    Quantize a unit-normalized float32 embedding to int8.
+
+    Args:
+        embedding (np.ndarray): Unit-length float32 vector
+
+    Returns:
+        np.ndarray: int8 vector; dot products are rescaled by
+            EMBEDDING_SCALE**2 to recover cosine similarity
+    """
+    return np.clip(np.round(embedding * 127), -127, 127).astype(np.int8)
+
+# Persistent cache backing store so restarts don't re-invoke the LLM for
+# previously reviewed code; requires the sqlite-vec extension
+CACHE_DB_PATH = os.path.join(os.path.dirname(__file__), 'cache.db')
+CACHE_TTL_DAYS = int(os.getenv('REVIEW_CACHE_TTL_DAYS', '7'))
+
+_cache_db: Optional[sqlite3.Connection] = None
+
+def init_persistent_cache() -> None:
+    """
+    Open the on-disk semantic cache and sweep expired entries.
+
+    Falls back to in-memory caching only if the sqlite-vec extension
+    cannot be loaded.
+    """
+    global _cache_db
+    try:
+        import sqlite_vec
+        conn = sqlite3.connect(CACHE_DB_PATH, check_same_thread=False)
+        sqlite_vec.load(conn)
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS vec_reviews '
+            '(embedding BLOB, response TEXT, fileName TEXT, ts INTEGER)'
+        )
+        cutoff = int(time.time()) - CACHE_TTL_DAYS * 86400
+        conn.execute('DELETE FROM vec_reviews WHERE ts < ?', (cutoff,))
+        conn.commit()
+        _cache_db = conn
+        app.logger.info("Persistent semantic cache enabled at %s", CACHE_DB_PATH)
+    except (ImportError, sqlite3.Error, AttributeError, OSError) as e:
+        # AttributeError/OSError cover Python builds without loadable
+        # extension support and missing native libraries
+        _cache_db = None
+        app.logger.warning("Persistent semantic cache unavailable: %s", e)
+
+# Inputs shorter than this can't produce a meaningful review and are
+# answered directly instead of burning seconds of LLM compute
+MIN_REVIEWABLE_CHARS = 20
+
+# '#' starts real code in these languages (preprocessor directives,
+# shebang-heavy scripts), so it can't be treated as a comment marker
+HASH_CODE_EXTENSIONS = (
+    '.c', '.h', '.cc', '.cpp', '.cxx', '.hpp', '.hh', '.m', '.mm',
+    '.sh', '.bash', '.zsh', '.csh'
+)
+
+def is_trivial_input(code: str, file_name: str = 'Unnamed') -> bool:
+    """
+    Decide whether code is too trivial to send to the LLM.
+
+    Args:
+        code (str): Source code from the request
+        file_name (str): Name of the file, used to decide which comment
+            markers apply
+
+    Returns:
+        bool: True for near-empty or comment-only input
+    """
+    stripped = code.strip()
+    if len(stripped) < MIN_REVIEWABLE_CHARS:
+        return True
+    comment_prefixes = ('//', '/*')
+    if not file_name.lower().endswith(HASH_CODE_EXTENSIONS):
+        comment_prefixes += ('#',)
+    lines = [line.strip() for line in stripped.splitlines() if line.strip()]
+    return all(line.startswith(comment_prefixes) for line in lines)
+
+# Runs CPU-bound work (the embedding encode) off the event loop so it
+# can't stall every other in-flight review
+EXECUTOR = ThreadPoolExecutor(max_workers=32)
+
+async def embed_code(code: str) -> np.ndarray:
+    """
+    Embed source code into a normalized vector for similarity lookup,
+    running the encode in the executor to keep the event loop free.
+
+    Args:
+        code (str): Source code to embed
+
+    Returns:
+        np.ndarray: Unit-length embedding vector
+    """
+    return await asyncio.get_event_loop().run_in_executor(
+        EXECUTOR,
+        functools.partial(EMBEDDING_MODEL.encode, code, normalize_embeddings=True)
+    )
+
+def lookup_cached_review(embedding: np.ndarray,
+                         file_name: str = 'Unnamed') -> Optional[Dict[str, Any]]:
+    """
+    Find a cached review whose code embedding is close enough to reuse,
+    checking the in-memory cache first and the persistent store second.
+
+    Args:
+        embedding (np.ndarray): Normalized embedding of the incoming code
+        file_name (str): Namespace for the persistent cache lookup
+
+    Returns:
+        Optional[Dict[str, Any]]: Cached review results, or None on miss
+    """
+    if len(_cache_responses) > 0:
+        query = quantize_embedding(embedding).astype(np.int32)
+        similarities = (_cache_embeddings @ query) * (EMBEDDING_SCALE ** 2)
+        best = int(np.argmax(similarities))
+        if similarities[best] > SIMILARITY_THRESHOLD:
+            return _cache_responses[best]
+
+    if _cache_db is not None:
+        row = _cache_db.execute(
+            'SELECT response, vec_distance_cosine(embedding, ?) AS distance '
+            'FROM vec_reviews WHERE fileName = ? ORDER BY distance LIMIT 1',
+            (embedding.tobytes(), file_name)
+        ).fetchone()
+        if row is not None and row[1] < 1 - SIMILARITY_THRESHOLD:
+            return orjson.loads(row[0])
+    return None
+
+def store_cached_review(embedding: np.ndarray, review: Dict[str, Any],
+                        file_name: str = 'Unnamed') -> None:
+    """
+    Insert a review into the semantic cache, evicting the oldest in-memory
+    entry once the cache is full and mirroring to the persistent store.
+
+    Args:
+        embedding (np.ndarray): Normalized embedding of the reviewed code
+        review (Dict[str, Any]): Review results to cache
+        file_name (str): Namespace for the persistent cache entry
+    """
+    global _cache_embeddings
+    if len(_cache_responses) >= CACHE_MAX_ENTRIES:
+        _cache_embeddings = _cache_embeddings[1:]
+        _cache_responses.pop(0)
+    _cache_embeddings = np.vstack([_cache_embeddings, quantize_embedding(embedding)])
+    _cache_responses.append(review)
+
+    if _cache_db is not None:
+        _cache_db.execute(
+            'INSERT INTO vec_reviews (embedding, response, fileName, ts) '
+            'VALUES (?, ?, ?, ?)',
+            (embedding.tobytes(), orjson.dumps(review).decode(), file_name, int(time.time()))
+        )
+        _cache_db.commit()
+
+# Request batcher: concurrent reviews arriving within a short window are
+# coalesced into a single Ollama call instead of queueing behind each other
+BATCH_MAX_SIZE = 8
+BATCH_WINDOW_SECONDS = 0.05
+
+# Cumulative code budget per batched call, keeping the combined prompt
+# well inside the num_ctx window; blocks at or above the solo threshold
+# get their own call so they neither overflow the context nor starve
+# co-batched reviews of the shared num_predict generation budget
+BATCH_MAX_CHARS = 16_000
+BATCH_SOLO_CHARS = BATCH_MAX_CHARS // 2
+
+# Splits a batched review on its 'REVIEW FOR BLOCK n:' headers in one
+# C-level pass instead of a per-line Python loop
+BATCH_SECTION_RE = re.compile(r'(?m)^\s*REVIEW FOR BLOCK (\d+):\s*$')
+
+_batch_queue: Optional[asyncio.Queue] = None
+_batch_worker_task: Optional[asyncio.Task] = None
+
+def warm_embedding_model() -> None:
+    """Run a throwaway encode so model load and tokenizer setup happen
+    before the first request instead of on its latency path"""
+    EMBEDDING_MODEL.encode(['warmup'])
+
+async def prewarm_ollama_connection() -> None:
+    """Pay the TCP handshake to Ollama before traffic arrives; the warm
+    connection stays pooled for the first real review"""
+    try:
+        await CLIENT.head(OLLAMA_API_BASE_URL)
+    except httpx.HTTPError:
+        pass  # some servers reject HEAD; the connection is still established
+
+@app.before_serving
+async def startup() -> None:
+    """Create the shared HTTP client, caches and batcher once the event loop is running"""
+    global CLIENT, _batch_queue, _batch_worker_task, _ollama_semaphore
+    init_persistent_cache()
+    _batch_queue = asyncio.Queue()
+    _batch_worker_task = asyncio.ensure_future(batch_worker())
+    _ollama_semaphore = asyncio.Semaphore(OLLAMA_NUM_PARALLEL)
+    app.logger.info("Dispatching at most %d concurrent Ollama requests", OLLAMA_NUM_PARALLEL)
+    limits = httpx.Limits(
+        max_keepalive_connections=10,
+        max_connections=32,
+        keepalive_expiry=300.0
+    )
+    CLIENT = httpx.AsyncClient(
+        transport=httpx.AsyncHTTPTransport(retries=3, http2=True, limits=limits),
+        timeout=httpx.Timeout(300.0, connect=10.0),
+        headers={
+            'Connection': 'keep-alive',
+            'Accept-Encoding': 'gzip, deflate'
+        }
+    )
+    threading.Thread(target=warm_embedding_model, daemon=True).start()
+    asyncio.ensure_future(prewarm_ollama_connection())
+
+@app.after_serving
+async def shutdown() -> None:
+    """Stop the batcher and close the shared HTTP client on server shutdown"""
+    if _batch_worker_task is not None:
+        _batch_worker_task.cancel()
+    if CLIENT is not None:
+        await CLIENT.aclose()
 
 def generate_comprehensive_code_review_prompt() -> str:
     """
     Generate a detailed, structured prompt for comprehensive code review.
-    
+
     Returns:
         str: A meticulously crafted prompt for thorough code analysis
     """
@@ -114,36 +411,278 @@ ANALYSIS FORMAT:
 - Quantify improvements where possible
 """
 
-def analyze_code_with_ollama(code: str) -> Dict[str, Any]:
+# Split the template once at import so the hot path is plain string
+# concatenation instead of re-building and format-parsing ~3 KB per request
+PROMPT_PREFIX, PROMPT_SUFFIX = generate_comprehensive_code_review_prompt().split('{code}')
+
+def build_ollama_payload(prompt: str, stream: bool = False) -> Dict[str, Any]:
     """
-    Perform comprehensive code analysis using Ollama model.
-    
+    Build the generation payload for an Ollama request.
+
     Args:
-        code (str): Source code to analyze
-    
+        prompt (str): Fully formatted prompt
+        stream (bool): Whether Ollama should stream the response
+
     Returns:
-        Dict[str, Any]: Comprehensive code review results
+        Dict[str, Any]: Request payload
     """
-    prompt = generate_comprehensive_code_review_prompt().format(code=code)
-    
-    payload = {
+    return {
         "model": "llama3.2:latest",
         "prompt": prompt,
-        "stream": False,
+        "stream": stream,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
         "options": {
             "temperature": 0.7,
-            "max_tokens": 4000  # Increased to accommodate detailed analysis
+            "num_predict": 2048,  # Ollama's native generation cap (max_tokens is ignored)
+            "num_ctx": 8192
         }
     }
-    
+
+# Tracks where review time goes so network, prompt-eval and generation
+# costs can be separated when choosing what to optimize next
+OLLAMA_LATENCY = Histogram(
+    'ollama_latency_seconds',
+    'Wall-clock time spent waiting on Ollama generations',
+    buckets=(0.5, 1, 2, 5, 10, 30, 60, 120, 300)
+)
+
+def extract_ollama_stats(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pull Ollama's generation counters out of a response body.
+
+    Args:
+        data (Dict[str, Any]): Parsed Ollama response
+
+    Returns:
+        Dict[str, Any]: Token counts, durations and derived tokens/sec
+    """
+    stats = {
+        key: data[key]
+        for key in ('eval_count', 'prompt_eval_count', 'eval_duration',
+                    'prompt_eval_duration', 'total_duration', 'load_duration')
+        if key in data
+    }
+    if stats.get('eval_count') and stats.get('eval_duration'):
+        stats['tokens_per_second'] = round(
+            stats['eval_count'] / (stats['eval_duration'] / 1e9), 1
+        )
+    return stats
+
+# Request-body compression is off by default: stock Ollama does not
+# decompress gzip requests, and on the default loopback deployment the
+# bytes saved are pure overhead anyway. Only enable when Ollama sits
+# behind a decompressing proxy on a remote network.
+OLLAMA_COMPRESS_REQUESTS = os.getenv('OLLAMA_COMPRESS_REQUESTS', '').lower() in ('1', 'true', 'yes')
+
+# Bodies below this size aren't worth the compression round-trip
+COMPRESS_MIN_BYTES = 1024
+
+def encode_ollama_body(payload: Dict[str, Any]) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Serialize an Ollama request body, gzip-compressing it when enabled
+    and large enough that fewer bytes on the wire beat the compression cost.
+
+    Args:
+        payload (Dict[str, Any]): Generation payload
+
+    Returns:
+        Tuple[bytes, Dict[str, str]]: Request body and matching headers
+    """
+    body = orjson.dumps(payload)
+    headers = {'Content-Type': 'application/json'}
+    if OLLAMA_COMPRESS_REQUESTS and len(body) >= COMPRESS_MIN_BYTES:
+        body = gzip.compress(body, compresslevel=6)
+        headers['Content-Encoding'] = 'gzip'
+    return body, headers
+
+async def call_ollama(prompt: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Send a single prompt to Ollama and return the generated text along
+    with the server's generation stats.
+
+    Args:
+        prompt (str): Fully formatted prompt
+
+    Returns:
+        Tuple[str, Dict[str, Any]]: Model-generated review text and
+            Ollama's token/duration counters
+    """
+    body, headers = encode_ollama_body(build_ollama_payload(prompt))
+    async with _ollama_semaphore:
+        with OLLAMA_LATENCY.time():
+            response = await CLIENT.post(OLLAMA_API_BASE_URL, content=body, headers=headers)
+    response.raise_for_status()
+    data = orjson.loads(response.content)
+    return data.get('response', 'No analysis generated'), extract_ollama_stats(data)
+
+def build_batch_prompt(codes: List[str]) -> str:
+    """
+    Build one review prompt covering several code blocks, each delimited
+    so the response can be split back per block.
+
+    Args:
+        codes (List[str]): Code blocks gathered by the batcher
+
+    Returns:
+        str: Combined prompt for a single Ollama call
+    """
+    blocks = '\n'.join(
+        f'----- CODE BLOCK {i} -----\n{code}'
+        for i, code in enumerate(codes, start=1)
+    )
+    instructions = (
+        f"\nThe code above contains {len(codes)} independent code blocks, "
+        "each introduced by a '----- CODE BLOCK n -----' marker. "
+        "Review every block separately following the full analysis format, "
+        "and begin each block's review with a line containing exactly "
+        "'REVIEW FOR BLOCK n:'.\n"
+    )
+    return PROMPT_PREFIX + blocks + PROMPT_SUFFIX + instructions
+
+def split_batch_response(review_text: str, count: int) -> Tuple[List[str], List[bool]]:
+    """
+    Split a batched review back into per-block reviews using the
+    'REVIEW FOR BLOCK n:' headers the prompt requested.
+
+    Args:
+        review_text (str): Full model output for the batch
+        count (int): Number of code blocks in the batch
+
+    Returns:
+        Tuple[List[str], List[bool]]: One review per block in block
+            order, and per-block flags marking which sections the model
+            actually produced (and are therefore safe to cache)
+    """
+    reviews = [''] * count
+    parts = BATCH_SECTION_RE.split(review_text)
+    for i in range(1, len(parts), 2):
+        index = int(parts[i]) - 1
+        if 0 <= index < count:
+            reviews[index] = parts[i + 1].strip()
+    # Blocks whose header the model skipped (or left empty) get the full
+    # text so no caller receives a blank review, and stay uncacheable
+    cacheable = [bool(review) for review in reviews]
+    reviews = [review if review else review_text for review in reviews]
+    return reviews, cacheable
+
+async def dispatch_batch(codes: List[str], futures: List[asyncio.Future]) -> None:
+    """
+    Serve one collected batch with a single Ollama call and fan the
+    results back to each caller's future.
+
+    Args:
+        codes (List[str]): Code blocks in the batch
+        futures (List[asyncio.Future]): One future per caller, in order
+    """
     try:
-        response = requests.post(OLLAMA_API_BASE_URL, json=payload)
-        response.raise_for_status()
-        return {
-            "comprehensive_review": response.json().get('response', 'No analysis generated'),
+        if len(codes) == 1:
+            prompt = PROMPT_PREFIX + codes[0] + PROMPT_SUFFIX
+            review_text, stats = await call_ollama(prompt)
+            reviews, cacheable = [review_text], [True]
+        else:
+            review_text, stats = await call_ollama(build_batch_prompt(codes))
+            reviews, cacheable = split_batch_response(review_text, len(codes))
+        for future, review, can_cache in zip(futures, reviews, cacheable):
+            if not future.done():
+                future.set_result((review, stats, can_cache))
+    except Exception as e:
+        for future in futures:
+            if not future.done():
+                future.set_exception(e)
+
+async def batch_worker() -> None:
+    """
+    Collect queued review requests for up to BATCH_WINDOW_SECONDS (or
+    BATCH_MAX_SIZE items / BATCH_MAX_CHARS of code) and dispatch each
+    batch as its own task; the Ollama semaphore bounds how many batches
+    are in flight at once. Blocks at or above BATCH_SOLO_CHARS — such as
+    the chunks review_large_code fans out — are dispatched alone so they
+    are never re-coalesced into an oversized prompt.
+    """
+    loop = asyncio.get_event_loop()
+    pending = None
+    while True:
+        item = pending if pending is not None else await _batch_queue.get()
+        pending = None
+        if len(item[0]) >= BATCH_SOLO_CHARS:
+            asyncio.ensure_future(dispatch_batch([item[0]], [item[1]]))
+            continue
+
+        batch = [item]
+        total_chars = len(item[0])
+        deadline = loop.time() + BATCH_WINDOW_SECONDS
+        while len(batch) < BATCH_MAX_SIZE:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(_batch_queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            if (len(item[0]) >= BATCH_SOLO_CHARS
+                    or total_chars + len(item[0]) > BATCH_MAX_CHARS):
+                pending = item  # flush the current batch; handle next round
+                break
+            batch.append(item)
+            total_chars += len(item[0])
+
+        codes = [code for code, _ in batch]
+        futures = [future for _, future in batch]
+        asyncio.ensure_future(dispatch_batch(codes, futures))
+
+async def analyze_code_with_ollama(code: str, file_name: str = 'Unnamed') -> Dict[str, Any]:
+    """
+    Perform comprehensive code analysis using Ollama model.
+
+    Args:
+        code (str): Source code to analyze
+        file_name (str): Name of the file being reviewed, used to
+            namespace the persistent cache
+
+    Returns:
+        Dict[str, Any]: Comprehensive code review results, including
+            per-phase timings under "metrics"
+    """
+    t0 = time.perf_counter()
+    embedding = await embed_code(code)
+    t1 = time.perf_counter()
+    cached_review = lookup_cached_review(embedding, file_name)
+    t2 = time.perf_counter()
+
+    if cached_review is not None:
+        metrics = {
+            "embed_ms": round((t1 - t0) * 1000, 1),
+            "cache_lookup_ms": round((t2 - t1) * 1000, 1),
+            "ollama_ms": 0.0,
+            "total_ms": round((t2 - t0) * 1000, 1),
+            "cache_hit": True
+        }
+        app.logger.info("Review served from cache: %s", metrics)
+        return {**cached_review, "metrics": metrics}
+
+    future = asyncio.get_event_loop().create_future()
+    await _batch_queue.put((code, future))
+
+    try:
+        review_text, ollama_stats, cacheable = await future
+        t3 = time.perf_counter()
+        review = {
+            "comprehensive_review": review_text,
             "status": "success"
         }
-    except requests.exceptions.RequestException as e:
+        if cacheable:
+            store_cached_review(embedding, review, file_name)
+        metrics = {
+            "embed_ms": round((t1 - t0) * 1000, 1),
+            "cache_lookup_ms": round((t2 - t1) * 1000, 1),
+            "ollama_ms": round((t3 - t2) * 1000, 1),
+            "total_ms": round((t3 - t0) * 1000, 1),
+            "cache_hit": False,
+            **ollama_stats
+        }
+        app.logger.info("Review completed: %s", metrics)
+        return {**review, "metrics": metrics}
+    except httpx.HTTPError as e:
         return {
             "error": f"Ollama API Request Failed: {e}",
             "status": "error"
@@ -154,45 +693,259 @@ def analyze_code_with_ollama(code: str) -> Dict[str, Any]:
             "status": "error"
         }
 
+def hard_split_segment(segment: str, max_chars: int) -> List[str]:
+    """
+    Split a segment with no usable internal boundaries — a single huge
+    top-level definition or a one-line minified file — into pieces no
+    larger than max_chars, preferring line breaks over mid-line cuts.
+
+    Args:
+        segment (str): Text exceeding max_chars
+        max_chars (int): Upper bound on piece size
+
+    Returns:
+        List[str]: Ordered pieces covering the segment
+    """
+    pieces = []
+    while len(segment) > max_chars:
+        cut = segment.rfind('\n', 1, max_chars)
+        cut = cut + 1 if cut > 0 else max_chars
+        pieces.append(segment[:cut])
+        segment = segment[cut:]
+    if segment:
+        pieces.append(segment)
+    return pieces
+
+def chunk_code(code: str, max_chars: int = MAX_CODE_CHARS) -> List[str]:
+    """
+    Split oversized code into chunks no larger than max_chars, breaking
+    on top-level def/class boundaries when the code parses as Python and
+    on line boundaries otherwise.
+
+    Args:
+        code (str): Source code to split
+        max_chars (int): Upper bound on chunk size
+
+    Returns:
+        List[str]: Ordered, non-overlapping chunks covering the code
+    """
+    lines = code.splitlines(keepends=True)
+    try:
+        boundaries = sorted({node.lineno - 1 for node in ast.parse(code).body})
+    except SyntaxError:
+        boundaries = list(range(len(lines)))
+    if not boundaries or boundaries[0] != 0:
+        boundaries.insert(0, 0)
+    boundaries.append(len(lines))
+
+    chunks = []
+    current = ''
+    for begin, end in zip(boundaries, boundaries[1:]):
+        segment = ''.join(lines[begin:end])
+        if len(segment) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ''
+            chunks.extend(hard_split_segment(segment, max_chars))
+            continue
+        if current and len(current) + len(segment) > max_chars:
+            chunks.append(current)
+            current = ''
+        current += segment
+    if current:
+        chunks.append(current)
+    return chunks
+
+async def review_large_code(code: str, file_name: str = 'Unnamed') -> Dict[str, Any]:
+    """
+    Review oversized code chunk by chunk concurrently, then merge the
+    chunk reviews with a final aggregation call.
+
+    Args:
+        code (str): Source code exceeding MAX_CODE_CHARS
+        file_name (str): Name of the file being reviewed
+
+    Returns:
+        Dict[str, Any]: Aggregated code review results
+    """
+    chunks = chunk_code(code)
+    results = await asyncio.gather(*[
+        analyze_code_with_ollama(chunk, f'{file_name}#chunk{i}')
+        for i, chunk in enumerate(chunks, start=1)
+    ])
+    failures = [result for result in results if result.get('status') != 'success']
+    if failures:
+        return failures[0]
+
+    combined = '\n\n'.join(
+        f"--- Review of chunk {i} ---\n{result['comprehensive_review']}"
+        for i, result in enumerate(results, start=1)
+    )
+    aggregation_prompt = (
+        "The reviews below cover consecutive chunks of one large source file. "
+        "Merge them into a single comprehensive review following the same "
+        "analysis format, deduplicating repeated findings and keeping the "
+        "most severe assessment where chunks disagree.\n\n" + combined
+    )
+    try:
+        merged_review, _ = await call_ollama(aggregation_prompt)
+        return {
+            "comprehensive_review": merged_review,
+            "status": "success"
+        }
+    except httpx.HTTPError as e:
+        return {
+            "error": f"Ollama API Request Failed: {e}",
+            "status": "error"
+        }
+
+async def stream_code_review(code: str, file_name: str = 'Unnamed') -> Response:
+    """
+    Stream an Ollama review to the client chunk by chunk instead of
+    buffering the full generation, cutting time-to-first-byte.
+
+    Args:
+        code (str): Source code to analyze
+        file_name (str): Name of the file being reviewed
+
+    Returns:
+        Response: NDJSON response forwarding Ollama's stream chunks
+    """
+    embedding = await embed_code(code)
+    cached_review = lookup_cached_review(embedding, file_name)
+    payload = build_ollama_payload(PROMPT_PREFIX + code + PROMPT_SUFFIX, stream=True)
+
+    async def generate():
+        if cached_review is not None:
+            chunk = {
+                "response": cached_review.get('comprehensive_review', ''),
+                "done": True
+            }
+            yield orjson.dumps(chunk) + b'\n'
+            return
+        try:
+            chunks = []
+            body, headers = encode_ollama_body(payload)
+            async with _ollama_semaphore:
+                async with CLIENT.stream(
+                    'POST', OLLAMA_API_BASE_URL,
+                    content=body,
+                    headers=headers
+                ) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        chunks.append(orjson.loads(line).get('response', ''))
+                        yield line.encode() + b'\n'
+            review = {
+                "comprehensive_review": ''.join(chunks),
+                "status": "success"
+            }
+            store_cached_review(embedding, review, file_name)
+        except httpx.HTTPError as e:
+            # Headers are already sent, so surface the failure as a
+            # terminal chunk in the API's usual error shape
+            yield orjson.dumps({
+                "error": f"Ollama API Request Failed: {e}",
+                "status": "error",
+                "done": True
+            }) + b'\n'
+        except Exception as e:
+            yield orjson.dumps({
+                "error": f"Unexpected Analysis Error: {e}",
+                "status": "error",
+                "done": True
+            }) + b'\n'
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+async def analyze_code_batch_with_ollama(codes: List[str]) -> List[Dict[str, Any]]:
+    """
+    Analyze multiple code snippets concurrently, overlapping Ollama inference.
+
+    Args:
+        codes (List[str]): Source code snippets to analyze
+
+    Returns:
+        List[Dict[str, Any]]: Review results in input order
+    """
+    return await asyncio.gather(*[analyze_code_with_ollama(code) for code in codes])
+
 @app.route('/api/review', methods=['POST'])
-def perform_deep_code_review():
+async def perform_deep_code_review():
     """
     Advanced endpoint for comprehensive code analysis
     """
     try:
-        data = request.get_json()
+        data = await request.get_json()
         code = data.get('code')
-        
+
         if not code:
             return jsonify({
                 "error": "No code provided for analysis",
                 "status": "error"
             }), 400
-        
-        review_results = analyze_code_with_ollama(code)
-        
+
+        file_name = data.get('fileName', 'Unnamed')
+
+        if is_trivial_input(code, file_name):
+            return jsonify({
+                "fileName": file_name,
+                "codeLength": len(code),
+                "reviewResults": {
+                    "comprehensive_review": "Input too small for meaningful review",
+                    "status": "success"
+                }
+            }), 200
+
+        if len(code) > MAX_CODE_CHARS:
+            # Chunked review needs complete per-chunk responses, so the
+            # size guard takes precedence over a stream request
+            review_results = await review_large_code(code, file_name)
+        elif data.get('stream'):
+            return await stream_code_review(code, file_name)
+        else:
+            review_results = await analyze_code_with_ollama(code, file_name)
+
         return jsonify({
-            "fileName": data.get('fileName', 'Unnamed'),
+            "fileName": file_name,
             "codeLength": len(code),
             "reviewResults": review_results
         }), 200
-    
+
+    except HTTPException:
+        raise  # let Quart return the proper status (e.g. 413) instead of a 500
     except Exception as e:
         return jsonify({
             "error": f"Internal Server Error: {e}",
             "status": "error"
         }), 500
 
+@app.errorhandler(RequestEntityTooLarge)
+async def handle_oversize_request(e: RequestEntityTooLarge):
+    """Return the oversize rejection in the same JSON shape as other errors"""
+    return jsonify({
+        "error": "Code exceeds the maximum reviewable size",
+        "status": "error"
+    }), 413
+
 @app.route('/health', methods=['GET'])
-def health_check():
+async def health_check():
     """Comprehensive health check endpoint"""
     return jsonify({
         'status': 'operational',
         'services': {
             'code_review': 'fully functional',
             'ollama_integration': 'connected'
-        }
+        },
+        'ollama_num_parallel': OLLAMA_NUM_PARALLEL
     })
 
+@app.route('/metrics', methods=['GET'])
+async def metrics():
+    """Prometheus scrape endpoint for the latency histograms"""
+    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
+
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    app.run(debug=True, port=5000)